@@ -1,17 +1,22 @@
 """Command line interface for the house loop generator."""
 from __future__ import annotations
 
-import argparse
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Iterable, List, Optional, Union
 
-from .generator import HouseLoopOptions, generate_house_loop
+from .generator import HouseLoopOptions, HouseLoopResult, generate_house_loop
 
 
 NOTE_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
 
+# Built lazily and reused so repeated CLI invocations in one process do not
+# pay the argparse construction cost each time.
+_PARSER = None
+
+
+def build_parser() -> "argparse.ArgumentParser":
+    import argparse
 
-def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description=(
             "Transform a source MIDI file into an 8-bar house loop with stabs, plucks "
@@ -64,22 +69,51 @@ def _pc_to_name(pc: int) -> str:
     return NOTE_NAMES[pc % 12]
 
 
-def main(argv: Optional[List[str]] = None) -> int:
-    parser = build_parser()
-    args = parser.parse_args(argv)
+def generate_cli(
+    input_path: Union[str, Path],
+    output_path: Union[str, Path],
+    *,
+    mode: str = "auto",
+    swing: float = 0.12,
+    tempo: Optional[float] = None,
+    seed: Optional[int] = None,
+    bars: int = 8,
+) -> HouseLoopResult:
+    """Generate and write a loop directly, bypassing argparse.
+
+    Intended for callers batch-processing many MIDI files in one process.
+    """
 
     options = HouseLoopOptions(
+        mode=mode,
+        swing=swing,
+        seed=seed,
+        tempo=tempo,
+        target_bars=bars,
+    )
+    result = generate_house_loop(Path(input_path), options)
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    result.midi.write(str(output_path))
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    global _PARSER
+    if _PARSER is None:
+        _PARSER = build_parser()
+    args = _PARSER.parse_args(argv)
+
+    result = generate_cli(
+        args.input,
+        args.output,
         mode=args.mode,
         swing=args.swing,
-        seed=args.seed,
         tempo=args.tempo,
-        target_bars=args.bars,
+        seed=args.seed,
+        bars=args.bars,
     )
-
-    result = generate_house_loop(args.input, options)
     output_path = args.output
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    result.midi.write(str(output_path))
 
     chord_summary = format_progression(_pc_to_name(chord.root_pc) for chord in result.chords)
     print("Generated loop info:")
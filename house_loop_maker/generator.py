@@ -3,11 +3,12 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional, Sequence, Union
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Union
+import functools
 import math
 import random
-import statistics
-from collections import Counter
+
+import numpy as np
 
 from . import simple_midi
 
@@ -23,21 +24,16 @@ class HouseLoopOptions:
     target_bars: int = 8
 
 
-@dataclass
-class NoteInfo:
-    """Lightweight container describing a MIDI note."""
-
-    pitch: int
-    start: float
-    end: float
-    velocity: int
+class Notes(NamedTuple):
+    """Columnar (structure-of-arrays) representation of the collected notes."""
 
-    @property
-    def duration(self) -> float:
-        return self.end - self.start
+    pitches: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+    velocities: np.ndarray
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ChordShape:
     """Represents the material for a single bar in the new loop."""
 
@@ -46,7 +42,7 @@ class ChordShape:
     label: str
 
 
-@dataclass
+@dataclass(slots=True)
 class HouseLoopResult:
     """Bundle containing the generated MIDI and metadata about the loop."""
 
@@ -59,6 +55,63 @@ class HouseLoopResult:
 ModeType = Union[str, None]
 
 
+_EUPHORIC_TEMPLATES = (
+    ("maj7", (0, 4, 7, 11)),
+    ("add9", (0, 2, 7, 9)),
+    ("sixnine", (0, 4, 7, 9, 14)),
+    ("suslift", (0, 5, 7, 9, 14)),
+)
+
+_MINOR_FIFTH_TEMPLATES = (
+    ("min7", (0, 3, 7, 10)),
+    ("min9", (0, 3, 7, 10, 14)),
+    ("power", (0, 7, 12)),
+    ("darkpad", (0, 3, 5, 10, 14)),
+)
+
+def _chord_pitches(root_pc: int, base_register: int, intervals: Sequence[int]) -> Tuple[int, ...]:
+    root_note = base_register + root_pc
+    if root_note < 36:
+        root_note += 12 * ((35 - root_note) // 12 + 1)
+    elif root_note > 60:
+        root_note -= 12 * ((root_note - 61) // 12 + 1)
+    chord_pitches = []
+    for interval in intervals:
+        pitch = root_note + interval
+        if pitch < 0:
+            pitch = (pitch % 12) + 12
+        if pitch > 108:
+            pitch -= 12 * ((pitch - 96) // 12 + 1)
+        chord_pitches.append(pitch)
+    # Ensure unique, sorted pitches; a linear pass suffices once sorted.
+    chord_pitches.sort()
+    unique_pitches = [chord_pitches[0]]
+    for pitch in chord_pitches[1:]:
+        if pitch != unique_pitches[-1]:
+            unique_pitches.append(pitch)
+    return tuple(unique_pitches)
+
+
+# Every chord the generator can ask for, instantiated once at import time:
+# 2 modes x 3 register bands x 4 templates x 12 roots.
+_CHORD_TABLE = {
+    (mode, register, label, root_pc): _chord_pitches(root_pc, register, intervals)
+    for mode, templates in (
+        ("euphoric", _EUPHORIC_TEMPLATES),
+        ("minor_fifth", _MINOR_FIFTH_TEMPLATES),
+    )
+    for register in (36, 48, 60)
+    for label, intervals in templates
+    for root_pc in range(12)
+}
+
+
+# Candidate stab hits: the base pattern plus the optional beat-2 hit.
+_STAB_CANDIDATE_BEATS = np.array([0.0, 0.5, 1.5, 2.0, 2.5, 3.5])
+_STAB_BASE_MASK = np.array([True, True, True, False, True, True])
+_PLUCK_BEATS = np.arange(8) * 0.5  # 1/8th notes across the bar
+
+
 def generate_house_loop(
     source: Union[str, Path, simple_midi.LoadedMidi],
     options: HouseLoopOptions,
@@ -80,24 +133,25 @@ def generate_house_loop(
     """
 
     rng = random.Random(options.seed)
+    gen = np.random.default_rng(options.seed)
     loaded = _load_midi(source)
     tempo = _resolve_tempo(loaded, options.tempo)
 
-    note_infos = _collect_notes(loaded)
+    notes = _collect_notes(loaded)
     bar_length = 60.0 / tempo * 4.0
     beat_length = 60.0 / tempo
-    mode = _resolve_mode(options.mode, note_infos)
+    mode = _resolve_mode(options.mode, notes)
 
-    base_register = _estimate_register(note_infos)
-    base_roots = _extract_roots(note_infos, bar_length, options.target_bars)
+    base_register = _estimate_register(notes)
+    base_roots = _extract_roots(notes, bar_length, options.target_bars)
 
     if not base_roots:
         base_roots = _default_roots(mode)
 
-    progression_roots = _expand_roots(base_roots, options.target_bars, mode, rng)
-    chords = [_build_chord(root, base_register, mode, rng) for root in progression_roots]
+    progression_roots = _expand_roots(base_roots, options.target_bars, mode, gen)
+    chords = [_build_chord(root, base_register, mode, rng, gen) for root in progression_roots]
 
-    loop = _render_loop(chords, tempo, options.swing, beat_length, bar_length, rng)
+    loop = _render_loop(chords, tempo, options.swing, beat_length, bar_length, gen)
     return HouseLoopResult(midi=loop, chords=chords, tempo=tempo, mode=mode)
 
 
@@ -119,21 +173,28 @@ def _resolve_tempo(loaded: simple_midi.LoadedMidi, override: Optional[float]) ->
     return tempo
 
 
-def _collect_notes(loaded: simple_midi.LoadedMidi) -> List[NoteInfo]:
-    notes = [
-        NoteInfo(
-            pitch=int(note.pitch),
-            start=float(note.start),
-            end=float(note.end),
-            velocity=int(note.velocity),
-        )
-        for note in loaded.notes
-    ]
-    notes.sort(key=lambda n: (n.start, n.pitch))
-    return notes
+def _collect_notes(loaded: simple_midi.LoadedMidi) -> Notes:
+    arrays = loaded.arrays
+    pitches = arrays.pitches.astype(np.int32)
+    starts = arrays.starts.astype(np.float64)
+    ends = arrays.ends.astype(np.float64)
+    velocities = arrays.velocities.astype(np.int32)
+    order = np.lexsort((pitches, starts))
+    return Notes(
+        pitches=pitches[order],
+        starts=starts[order],
+        ends=ends[order],
+        velocities=velocities[order],
+    )
+
+
+def _rotl12(mask: int, k: int) -> int:
+    """Rotate a 12-bit pitch-class mask left by ``k`` semitones."""
+
+    return ((mask << k) | (mask >> (12 - k))) & 0xFFF
 
 
-def _resolve_mode(mode_arg: ModeType, note_infos: Sequence[NoteInfo]) -> str:
+def _resolve_mode(mode_arg: ModeType, notes: Notes) -> str:
     if mode_arg and mode_arg not in {"auto", "euphoric", "minor_fifth"}:
         raise ValueError(
             "mode must be one of 'auto', 'euphoric', or 'minor_fifth'"
@@ -141,62 +202,69 @@ def _resolve_mode(mode_arg: ModeType, note_infos: Sequence[NoteInfo]) -> str:
     if mode_arg and mode_arg != "auto":
         return mode_arg
 
-    pitch_classes = [note.pitch % 12 for note in note_infos]
-    if not pitch_classes:
+    if notes.pitches.size == 0:
         return "euphoric"
 
-    major_thirds = 0
-    minor_thirds = 0
-    pcs = set(pitch_classes)
-    for pc in pcs:
-        if (pc + 4) % 12 in pcs:
-            major_thirds += 1
-        if (pc + 3) % 12 in pcs:
-            minor_thirds += 1
+    mask = int(np.bitwise_or.reduce(1 << (notes.pitches % 12)))
+    major_thirds = (mask & _rotl12(mask, 4)).bit_count()
+    minor_thirds = (mask & _rotl12(mask, 3)).bit_count()
     if minor_thirds > major_thirds:
         return "minor_fifth"
     return "euphoric"
 
 
-def _estimate_register(note_infos: Sequence[NoteInfo]) -> int:
-    if not note_infos:
+def _estimate_register(notes: Notes) -> int:
+    if notes.pitches.size == 0:
         return 48  # Around C3
-    average_pitch = statistics.fmean(note.pitch for note in note_infos)
-    register = int(round(average_pitch / 12.0) * 12)
+    register = int(round(float(notes.pitches.mean()) / 12.0) * 12)
     register = max(36, min(60, register))
     return register
 
 
 def _extract_roots(
-    note_infos: Sequence[NoteInfo],
+    notes: Notes,
     bar_length: float,
     target_bars: int,
 ) -> List[int]:
-    if not note_infos:
+    if notes.pitches.size == 0 or target_bars <= 0:
         return []
-    bars: List[List[int]] = [[] for _ in range(target_bars)]
-    for note in note_infos:
-        start_bar = int(note.start // bar_length)
-        if start_bar >= target_bars:
-            continue
-        end_bar = int(math.ceil(note.end / bar_length))
-        end_bar = min(end_bar, target_bars)
-        for bar in range(start_bar, end_bar):
-            weight = max(1, int(round(note.duration / (bar_length / 4.0))))
-            bars[bar].extend([note.pitch % 12] * weight)
+
+    start_bar = (notes.starts // bar_length).astype(np.int32)
+    keep = start_bar < target_bars
+    start_bar = start_bar[keep]
+    if start_bar.size == 0:
+        return []
+    starts = notes.starts[keep]
+    ends = notes.ends[keep]
+    pcs = notes.pitches[keep] % 12
+
+    end_bar = np.minimum(np.ceil(ends / bar_length).astype(np.int32), target_bars)
+    weights = np.maximum(
+        1, np.round((ends - starts) / (bar_length / 4.0)).astype(np.int64)
+    )
+
+    # Expand multi-bar notes so each (bar, pitch class) pair is counted once
+    # per bar the note overlaps.
+    spans = np.clip(end_bar - start_bar, 0, None)
+    bar_idx = np.repeat(start_bar, spans)
+    bar_idx += np.arange(bar_idx.size) - np.repeat(np.cumsum(spans) - spans, spans)
+    hist = np.bincount(
+        bar_idx * 12 + np.repeat(pcs, spans),
+        weights=np.repeat(weights, spans),
+        minlength=target_bars * 12,
+    ).reshape(target_bars, 12)
+
+    if not hist.any():
+        return []
+    bar_roots = hist.argmax(axis=1)
+    empty = hist.sum(axis=1) == 0
     roots: List[int] = []
     previous_root = 0
-    any_content = False
-    for bar_notes in bars:
-        if not bar_notes:
-            roots.append(previous_root)
-            continue
-        any_content = True
-        counts = Counter(bar_notes)
-        root_pc = max(counts.items(), key=lambda kv: (kv[1], -kv[0]))[0]
-        roots.append(root_pc)
-        previous_root = root_pc
-    return roots if any_content else []
+    for bar in range(target_bars):
+        if not empty[bar]:
+            previous_root = int(bar_roots[bar])
+        roots.append(previous_root)
+    return roots
 
 
 def _default_roots(mode: str) -> List[int]:
@@ -209,7 +277,7 @@ def _expand_roots(
     base_roots: Sequence[int],
     target_bars: int,
     mode: str,
-    rng: random.Random,
+    gen: np.random.Generator,
 ) -> List[int]:
     if not base_roots:
         base_roots = _default_roots(mode)
@@ -217,19 +285,23 @@ def _expand_roots(
         "euphoric": [0, 2, 4, 5, 7, -3],
         "minor_fifth": [0, 3, 5, 7, 10, -5],
     }[mode]
+    # One batched draw per decision kind for the whole progression instead
+    # of 2-3 Python-level RNG calls per bar.
+    u = gen.random(target_bars * 3)
+    adjust_picks = gen.choice(adjustments, size=target_bars)
+    lift_picks = gen.choice([2, 5, 7], size=target_bars)
+    bump_picks = gen.choice([5, 7, 9], size=target_bars)
     progression: List[int] = []
-    previous = base_roots[0] % 12
     for index in range(target_bars):
         root = base_roots[index % len(base_roots)] % 12
-        if rng.random() < 0.35:
-            root = (root + rng.choice(adjustments)) % 12
-        if progression and rng.random() < 0.2:
+        if u[index * 3] < 0.35:
+            root = (root + adjust_picks[index]) % 12
+        if progression and u[index * 3 + 1] < 0.2:
             # small leading-tone lift for additional euphoria
-            root = (progression[-1] + rng.choice([2, 5, 7])) % 12
-        if progression and progression[-1] == root and rng.random() < 0.4:
-            root = (root + rng.choice([5, 7, 9])) % 12
-        previous = root
-        progression.append(previous)
+            root = (progression[-1] + lift_picks[index]) % 12
+        if progression and progression[-1] == root and u[index * 3 + 2] < 0.4:
+            root = (root + bump_picks[index]) % 12
+        progression.append(int(root))
     return progression
 
 
@@ -238,39 +310,16 @@ def _build_chord(
     base_register: int,
     mode: str,
     rng: random.Random,
+    gen: np.random.Generator,
 ) -> ChordShape:
-    if mode == "euphoric":
-        templates = [
-            ("maj7", [0, 4, 7, 11]),
-            ("add9", [0, 2, 7, 9]),
-            ("sixnine", [0, 4, 7, 9, 14]),
-            ("suslift", [0, 5, 7, 9, 14]),
-        ]
-    else:
-        templates = [
-            ("min7", [0, 3, 7, 10]),
-            ("min9", [0, 3, 7, 10, 14]),
-            ("power", [0, 7, 12]),
-            ("darkpad", [0, 3, 5, 10, 14]),
-        ]
+    templates = _EUPHORIC_TEMPLATES if mode == "euphoric" else _MINOR_FIFTH_TEMPLATES
     label, intervals = rng.choice(templates)
-    root_note = base_register + root_pc
-    while root_note < 36:
-        root_note += 12
-    while root_note > 60:
-        root_note -= 12
-    chord_pitches = []
-    for interval in intervals:
-        pitch = root_note + interval
-        if pitch < 0:
-            pitch = (pitch % 12) + 12
-        if pitch > 108:
-            pitch -= 12 * ((pitch - 96) // 12 + 1)
-        chord_pitches.append(pitch)
-    # Ensure unique, sorted pitches
-    unique_pitches = sorted(set(chord_pitches))
+    table_entry = _CHORD_TABLE.get((mode, base_register, label, root_pc % 12))
+    if table_entry is None:
+        table_entry = _chord_pitches(root_pc % 12, base_register, intervals)
+    unique_pitches = list(table_entry)
     # Additional shimmer
-    if rng.random() < 0.55:
+    if gen.random() < 0.55:
         top_pitch = unique_pitches[-1] + 12
         if top_pitch <= 108:
             unique_pitches.append(top_pitch)
@@ -283,33 +332,55 @@ def _render_loop(
     swing: float,
     beat_length: float,
     bar_length: float,
-    rng: random.Random,
+    gen: np.random.Generator,
 ) -> simple_midi.SimpleMidiFile:
     swing = max(0.0, min(0.4, swing))
 
     stabs = simple_midi.MidiInstrument(
         name="House Stabs",
-        program=simple_midi.instrument_name_to_program("SynthBrass 1"),
+        program=_program_for("SynthBrass 1"),
         channel=0,
     )
     plucks = simple_midi.MidiInstrument(
         name="Pluck Arp",
-        program=simple_midi.instrument_name_to_program("Lead 1 (square)"),
+        program=_program_for("Lead 1 (square)"),
         channel=1,
     )
     pads = simple_midi.MidiInstrument(
         name="Airy Pad",
-        program=simple_midi.instrument_name_to_program("Synth Pad 2 (warm)"),
+        program=_program_for("Synth Pad 2 (warm)"),
         channel=2,
     )
 
+    # Preallocate columnar buffers sized for the worst case so the render
+    # passes write by index instead of allocating one MidiNote per hit.
+    stab_buffer = _note_buffer(sum(6 * len(chord.pitches) for chord in chords))
+    pluck_buffer = _note_buffer(8 * len(chords))
+    pad_buffer = _note_buffer(sum(len(chord.pitches) for chord in chords))
+    stab_count = pluck_count = pad_count = 0
+
+    # The swing offset is a fixed function of the pattern, so resolve the
+    # bar-relative start times once instead of per note.
+    stab_starts_rel = _swung_starts(_STAB_CANDIDATE_BEATS, beat_length, swing)
+    pluck_starts_rel = _swung_starts(_PLUCK_BEATS, beat_length, swing * 0.8)
+
     for bar_index, chord in enumerate(chords):
         bar_start = bar_index * bar_length
         bar_end = bar_start + bar_length
 
-        _render_stabs(stabs, chord, bar_start, bar_end, beat_length, swing, rng)
-        _render_plucks(plucks, chord, bar_start, bar_end, beat_length, swing, rng)
-        _render_pads(pads, chord, bar_start, bar_end, rng)
+        stab_count = _render_stabs(
+            stab_buffer, stab_count, chord, bar_start, bar_end, beat_length,
+            stab_starts_rel, gen
+        )
+        pluck_count = _render_plucks(
+            pluck_buffer, pluck_count, chord, bar_start, bar_end, beat_length,
+            pluck_starts_rel, gen
+        )
+        pad_count = _render_pads(pad_buffer, pad_count, chord, bar_start, bar_end, gen)
+
+    stabs.notes = _notes_from_buffer(stab_buffer, stab_count)
+    plucks.notes = _notes_from_buffer(pluck_buffer, pluck_count)
+    pads.notes = _notes_from_buffer(pad_buffer, pad_count)
 
     midi = simple_midi.SimpleMidiFile(
         tempo=tempo,
@@ -319,105 +390,133 @@ def _render_loop(
     return midi
 
 
-def _apply_swing(start_time: float, beat_position: float, beat_length: float, swing: float) -> float:
-    eighth_index = int(round(beat_position * 2))
-    if eighth_index % 2 == 1:
-        return start_time + swing * beat_length * 0.5
-    return start_time
+@functools.cache
+def _program_for(name: str) -> int:
+    """Resolve a GM instrument name once and reuse it across loop generations."""
+
+    return simple_midi.instrument_name_to_program(name)
+
+
+def _note_buffer(capacity: int) -> Notes:
+    return Notes(
+        pitches=np.empty(capacity, dtype=np.int32),
+        starts=np.empty(capacity, dtype=np.float64),
+        ends=np.empty(capacity, dtype=np.float64),
+        velocities=np.empty(capacity, dtype=np.int32),
+    )
+
+
+def _notes_from_buffer(buffer: Notes, count: int) -> List[simple_midi.MidiNote]:
+    return [
+        simple_midi.MidiNote(pitch=int(p), start=float(s), end=float(e), velocity=int(v))
+        for p, s, e, v in zip(
+            buffer.pitches[:count],
+            buffer.starts[:count],
+            buffer.ends[:count],
+            buffer.velocities[:count],
+        )
+    ]
+
+
+def _swung_starts(pattern: np.ndarray, beat_length: float, swing: float) -> np.ndarray:
+    """Bar-relative start times for ``pattern`` with swing applied to off-eighths."""
+
+    odd_eighth = np.round(pattern * 2).astype(np.int64) % 2 == 1
+    return pattern * beat_length + np.where(odd_eighth, swing * beat_length * 0.5, 0.0)
 
 
 def _render_stabs(
-    instrument: simple_midi.MidiInstrument,
+    buffer: Notes,
+    count: int,
     chord: ChordShape,
     bar_start: float,
     bar_end: float,
     beat_length: float,
-    swing: float,
-    rng: random.Random,
-) -> None:
-    base_pattern = [0.0, 0.5, 1.5, 2.5, 3.5]
-    pattern = list(base_pattern)
-    if rng.random() < 0.4:
-        pattern.append(2.0)
-    if rng.random() < 0.3 and 0.0 in pattern:
-        pattern.remove(0.0)
-    pattern.sort()
-
-    for step_index, beat in enumerate(pattern):
-        start = bar_start + beat * beat_length
-        start = _apply_swing(start, beat, beat_length, swing)
-        duration = min(beat_length * 0.35, bar_end - start - 0.01)
-        if duration <= 0:
-            continue
-        velocity = int(75 + rng.random() * 35)
-        for pitch in chord.pitches:
-            vel = max(0, min(127, velocity + rng.randint(-5, 5)))
-            instrument.notes.append(
-                simple_midi.MidiNote(
-                    pitch=pitch,
-                    start=start,
-                    end=start + duration,
-                    velocity=vel,
-                )
-            )
+    starts_rel: np.ndarray,
+    gen: np.random.Generator,
+) -> int:
+    include = _STAB_BASE_MASK.copy()
+    if gen.random() < 0.4:
+        include[3] = True  # extra hit on beat 2
+    if gen.random() < 0.3:
+        include[0] = False  # drop the downbeat
+    starts = bar_start + starts_rel[include]
+
+    # Batch every per-note draw for the bar into two array calls and clip
+    # the whole velocity grid at once.
+    velocities = (75 + gen.random(starts.size) * 35).astype(np.int64)
+    jitters = gen.integers(-5, 6, size=(starts.size, len(chord.pitches)))
+    vels = np.clip(velocities[:, None] + jitters, 0, 127)
+
+    durations = np.minimum(beat_length * 0.35, bar_end - starts - 0.01)
+    keep = durations > 0
+    starts = starts[keep]
+    durations = durations[keep]
+    vels = vels[keep]
+
+    n_pitches = len(chord.pitches)
+    end = count + starts.size * n_pitches
+    buffer.pitches[count:end] = np.tile(chord.pitches, starts.size)
+    buffer.starts[count:end] = np.repeat(starts, n_pitches)
+    buffer.ends[count:end] = np.repeat(starts + durations, n_pitches)
+    buffer.velocities[count:end] = vels.ravel()
+    return end
 
 
 def _render_plucks(
-    instrument: simple_midi.MidiInstrument,
+    buffer: Notes,
+    count: int,
     chord: ChordShape,
     bar_start: float,
     bar_end: float,
     beat_length: float,
-    swing: float,
-    rng: random.Random,
-) -> None:
-    pattern = [i * 0.5 for i in range(8)]  # 1/8th notes across the bar
+    starts_rel: np.ndarray,
+    gen: np.random.Generator,
+) -> int:
     chord_cycle = chord.pitches
-    if rng.random() < 0.5:
+    if gen.random() < 0.5:
         chord_cycle = [p + 12 for p in chord_cycle if p + 12 <= 115]
     if not chord_cycle:
         chord_cycle = chord.pitches
 
-    for idx, beat in enumerate(pattern):
-        start = bar_start + beat * beat_length
-        start = _apply_swing(start, beat, beat_length, swing * 0.8)
-        duration = min(beat_length * 0.45, bar_end - start - 0.01)
-        if duration <= 0:
-            continue
-        pitch = chord_cycle[idx % len(chord_cycle)]
-        # occasional octave jumps
-        if rng.random() < 0.25 and pitch + 12 <= 115:
-            pitch += 12
-        velocity = int(60 + rng.random() * 30)
-        instrument.notes.append(
-            simple_midi.MidiNote(
-                velocity=max(0, min(127, velocity)),
-                pitch=pitch,
-                start=start,
-                end=start + duration,
-            )
-        )
+    starts = bar_start + starts_rel
+    jumps = gen.random(starts.size)
+    velocities = np.clip((60 + gen.random(starts.size) * 30).astype(np.int64), 0, 127)
+
+    pitches = np.asarray(chord_cycle, dtype=np.int64)[
+        np.arange(starts.size) % len(chord_cycle)
+    ]
+    # occasional octave jumps
+    pitches = np.where((jumps < 0.25) & (pitches + 12 <= 115), pitches + 12, pitches)
+
+    durations = np.minimum(beat_length * 0.45, bar_end - starts - 0.01)
+    keep = durations > 0
+
+    end = count + int(keep.sum())
+    buffer.pitches[count:end] = pitches[keep]
+    buffer.starts[count:end] = starts[keep]
+    buffer.ends[count:end] = (starts + durations)[keep]
+    buffer.velocities[count:end] = velocities[keep]
+    return end
 
 
 def _render_pads(
-    instrument: simple_midi.MidiInstrument,
+    buffer: Notes,
+    count: int,
     chord: ChordShape,
     bar_start: float,
     bar_end: float,
-    rng: random.Random,
-) -> None:
-    start = bar_start
-    end = bar_end - 0.05
-    velocity = int(50 + rng.random() * 20)
-    for pitch in chord.pitches:
-        pad_pitch = pitch
-        if rng.random() < 0.35 and pad_pitch - 12 >= 36:
-            pad_pitch -= 12
-        instrument.notes.append(
-            simple_midi.MidiNote(
-                velocity=max(0, min(127, velocity)),
-                pitch=pad_pitch,
-                start=start,
-                end=end,
-            )
-        )
+    gen: np.random.Generator,
+) -> int:
+    velocity = max(0, min(127, int(50 + gen.random() * 20)))
+    drops = gen.random(len(chord.pitches))
+
+    pitches = np.asarray(chord.pitches, dtype=np.int64)
+    pitches = np.where((drops < 0.35) & (pitches - 12 >= 36), pitches - 12, pitches)
+
+    end = count + pitches.size
+    buffer.pitches[count:end] = pitches
+    buffer.starts[count:end] = bar_start
+    buffer.ends[count:end] = bar_end - 0.05
+    buffer.velocities[count:end] = velocity
+    return end
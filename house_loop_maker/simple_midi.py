@@ -1,12 +1,39 @@
 """A tiny MIDI reader/writer tailored for the house loop generator."""
 from __future__ import annotations
 
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Deque, Dict, List, Optional, Tuple, Union
+import heapq
+import itertools
+import operator
+import os
+import struct
 
+import numpy as np
 
-@dataclass
+
+# Precompiled big-endian readers/writers for chunk headers and lengths.
+_U32 = struct.Struct(">I")
+_U16 = struct.Struct(">H")
+_MTHD = struct.Struct(">4sIHHH")  # magic, header length, format, tracks, division
+_NOTE_MSG = struct.Struct("BBB")  # status, pitch, velocity
+_BB = struct.Struct("BB")  # two parameter bytes
+
+# Parameter byte count per status byte, so the event loop dispatches on one
+# table lookup instead of a chain of mask-and-membership tests.
+_CHANNEL_EVENT_LEN = bytes(
+    2 if (status & 0xF0) in (0x80, 0x90, 0xA0, 0xB0, 0xE0) else 1
+    for status in range(256)
+)
+
+# Minimum number of tracks before load_midi parses them on a thread pool.
+_PARALLEL_TRACK_THRESHOLD = 8
+
+
+@dataclass(slots=True)
 class MidiNote:
     pitch: int
     start: float  # seconds
@@ -14,7 +41,7 @@ class MidiNote:
     velocity: int
 
 
-@dataclass
+@dataclass(slots=True)
 class MidiInstrument:
     name: str
     program: int
@@ -22,14 +49,41 @@ class MidiInstrument:
     notes: List[MidiNote] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(slots=True)
+class LoadedMidiArrays:
+    """Structure-of-arrays layout for the notes of a loaded file."""
+
+    pitches: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+    velocities: np.ndarray
+
+
+@dataclass(slots=True)
 class LoadedMidi:
     tempo: float
     ticks_per_quarter: int
-    notes: List[MidiNote]
-
-
-@dataclass
+    arrays: LoadedMidiArrays
+    _notes: Optional[List[MidiNote]] = field(default=None, init=False, repr=False)
+
+    @property
+    def notes(self) -> List[MidiNote]:
+        """Per-note objects, materialized lazily from the arrays."""
+
+        if self._notes is None:
+            self._notes = [
+                MidiNote(pitch=int(p), start=float(s), end=float(e), velocity=int(v))
+                for p, s, e, v in zip(
+                    self.arrays.pitches,
+                    self.arrays.starts,
+                    self.arrays.ends,
+                    self.arrays.velocities,
+                )
+            ]
+        return self._notes
+
+
+@dataclass(slots=True)
 class SimpleMidiFile:
     tempo: float
     ticks_per_quarter: int
@@ -49,85 +103,140 @@ GM_PROGRAMS: Dict[str, int] = {
 }
 
 
+_MISSING = object()
+
+
 def instrument_name_to_program(name: str) -> int:
-    if name not in GM_PROGRAMS:
+    program = GM_PROGRAMS.get(name, _MISSING)
+    if program is _MISSING:
         raise KeyError(f"Unknown General MIDI instrument name: {name}")
-    return GM_PROGRAMS[name]
+    return program
 
 
 def load_midi(path: Union[str, Path]) -> LoadedMidi:
     path = Path(path)
     data = path.read_bytes()
+    # Parse through a memoryview so chunk and track slices are O(1) views
+    # instead of fresh bytes copies. The views never outlive ``data``.
+    view = memoryview(data)
     cursor = 0
-    if data[cursor:cursor + 4] != b"MThd":
+    if view[cursor:cursor + 4] != b"MThd":
         raise ValueError("Not a valid MIDI file (missing MThd header)")
     cursor += 4
-    header_length = int.from_bytes(data[cursor:cursor + 4], "big")
+    header_length = _U32.unpack_from(view, cursor)[0]
     cursor += 4
-    header_data = data[cursor:cursor + header_length]
+    header_data = view[cursor:cursor + header_length]
     cursor += header_length
 
     if len(header_data) < 6:
         raise ValueError("Invalid MIDI header")
-    _ = int.from_bytes(header_data[0:2], "big")
-    num_tracks = int.from_bytes(header_data[2:4], "big")
-    ticks_per_quarter = int.from_bytes(header_data[4:6], "big")
+    _ = _U16.unpack_from(header_data, 0)[0]
+    num_tracks = _U16.unpack_from(header_data, 2)[0]
+    ticks_per_quarter = _U16.unpack_from(header_data, 4)[0]
 
     if ticks_per_quarter & 0x8000:
         raise ValueError("SMPTE time code is not supported")
 
-    tempo_us = 500000  # Default 120 BPM
-    events: List[Tuple[int, str, Tuple[int, ...]]] = []
-
+    track_views: List[memoryview] = []
     for _ in range(num_tracks):
-        if data[cursor:cursor + 4] != b"MTrk":
+        if view[cursor:cursor + 4] != b"MTrk":
             raise ValueError("Invalid MIDI track header")
         cursor += 4
-        track_length = int.from_bytes(data[cursor:cursor + 4], "big")
+        track_length = _U32.unpack_from(view, cursor)[0]
         cursor += 4
-        track_data = data[cursor:cursor + track_length]
+        track_views.append(view[cursor:cursor + track_length])
         cursor += track_length
-        events.extend(_parse_track(track_data))
 
-    events.sort(key=lambda e: e[0])
-    active: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
-    notes: List[MidiNote] = []
-
-    for tick, kind, payload in events:
-        if kind == "tempo" and tempo_us == 500000:
+    # Tracks parse independently, so spread heavily multi-track files over a
+    # thread pool; the thread overhead is not worth it for a handful.
+    if len(track_views) >= _PARALLEL_TRACK_THRESHOLD:
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            per_track = list(executor.map(_parse_track, track_views))
+    else:
+        per_track = [_parse_track(track_data) for track_data in track_views]
+    events: List[Tuple[int, str, Tuple[int, ...]]] = list(
+        itertools.chain.from_iterable(per_track)
+    )
+
+    # Plain tuple comparison sorts by tick first and breaks ties
+    # deterministically, without a Python-level key callback per compare.
+    events.sort()
+
+    # The first tempo event wins; resolve it before conversion so every tick
+    # can be scaled in one vectorized step afterwards.
+    tempo_us = 500000  # Default 120 BPM
+    for _, kind, payload in events:
+        if kind == "tempo":
             tempo_us = payload[0]
-        elif kind == "note":
-            event_type, channel, pitch, velocity = payload
-            key = (channel, pitch)
-            if event_type == 0x90 and velocity > 0:
-                active.setdefault(key, []).append((tick, velocity))
-            else:
-                starts = active.get(key)
-                if starts:
-                    start_tick, start_vel = starts.pop()
-                    start = _ticks_to_seconds(start_tick, tempo_us, ticks_per_quarter)
-                    end = _ticks_to_seconds(tick, tempo_us, ticks_per_quarter)
-                    notes.append(
-                        MidiNote(pitch=pitch, start=start, end=end, velocity=start_vel)
-                    )
+            break
+
+    note_events = [
+        (tick, payload[0], payload[1], payload[2], payload[3])
+        for tick, kind, payload in events
+        if kind == "note"
+    ]
+    event_count = len(note_events)
+    ticks = np.fromiter((e[0] for e in note_events), dtype=np.int64, count=event_count)
+    pitches = np.fromiter((e[3] for e in note_events), dtype=np.int64, count=event_count)
+    velocities = np.fromiter((e[4] for e in note_events), dtype=np.int64, count=event_count)
+
+    # Pair note-ons with note-offs by event index; the tick arithmetic and
+    # second conversion then happen as whole-array operations. A deque per
+    # (channel, pitch) pairs each off with the oldest open on in O(1), which
+    # is also the correct match for overlapping same-pitch notes.
+    active: Dict[Tuple[int, int], Deque[int]] = defaultdict(deque)
+    start_indices: List[int] = []
+    end_indices: List[int] = []
+    for index, (_, event_type, channel, pitch, velocity) in enumerate(note_events):
+        key = (channel, pitch)
+        if event_type == 0x90 and velocity > 0:
+            active[key].append(index)
         else:
-            continue
+            pending = active.get(key)
+            if pending:
+                start_indices.append(pending.popleft())
+                end_indices.append(index)
+
+    seconds = ticks * (tempo_us / 1_000_000.0 / ticks_per_quarter)
+    start_idx = np.asarray(start_indices, dtype=np.int64)
+    end_idx = np.asarray(end_indices, dtype=np.int64)
+    note_starts = seconds[start_idx]
+    note_pitches = pitches[start_idx]
+    order = np.lexsort((note_pitches, note_starts))
+    arrays = LoadedMidiArrays(
+        pitches=note_pitches[order].astype(np.int16),
+        starts=note_starts[order],
+        ends=seconds[end_idx][order],
+        velocities=velocities[start_idx][order].astype(np.uint8),
+    )
 
     tempo_bpm = 60_000_000 / tempo_us
-    notes.sort(key=lambda n: (n.start, n.pitch))
-    return LoadedMidi(tempo=tempo_bpm, ticks_per_quarter=ticks_per_quarter, notes=notes)
+    return LoadedMidi(tempo=tempo_bpm, ticks_per_quarter=ticks_per_quarter, arrays=arrays)
 
 
-def _parse_track(track_data: bytes) -> List[Tuple[int, str, Tuple[int, ...]]]:
+def _parse_track(track_data: Union[bytes, memoryview]) -> List[Tuple[int, str, Tuple[int, ...]]]:
     events: List[Tuple[int, str, Tuple[int, ...]]] = []
     index = 0
     tick = 0
     running_status: Optional[int] = None
-
-    while index < len(track_data):
-        delta, index = _read_vlq(track_data, index)
+    # Hoist loop-invariant lookups: for dense tracks each of these would
+    # otherwise be re-resolved tens of thousands of times.
+    length = len(track_data)
+    append = events.append
+    from_bytes = int.from_bytes
+    unpack_bb = _BB.unpack_from
+
+    while index < length:
+        # Inline the one-byte fast path: most delta-times are < 128, and
+        # skipping the _read_vlq call saves a frame per event.
+        byte = track_data[index]
+        if byte < 0x80:
+            delta = byte
+            index += 1
+        else:
+            delta, index = _read_vlq(track_data, index)
         tick += delta
-        if index >= len(track_data):
+        if index >= length:
             break
         status_byte = track_data[index]
         if status_byte & 0x80:
@@ -139,44 +248,80 @@ def _parse_track(track_data: bytes) -> List[Tuple[int, str, Tuple[int, ...]]]:
             raise ValueError("Running status encountered without previous status byte")
 
         if status_byte == 0xFF:
-            if index >= len(track_data):
+            if index >= length:
                 break
             meta_type = track_data[index]
             index += 1
-            length, index = _read_vlq(track_data, index)
-            meta_data = track_data[index:index + length]
-            index += length
-            if meta_type == 0x51 and length == 3:
-                tempo_us = int.from_bytes(meta_data, "big")
-                events.append((tick, "tempo", (tempo_us,)))
+            if index >= length:
+                break
+            byte = track_data[index]
+            if byte < 0x80:
+                meta_length = byte
+                index += 1
+            else:
+                meta_length, index = _read_vlq(track_data, index)
+            meta_data = track_data[index:index + meta_length]
+            index += meta_length
+            if meta_type == 0x51 and meta_length == 3:
+                tempo_us = from_bytes(meta_data, "big")
+                append((tick, "tempo", (tempo_us,)))
             continue
         if status_byte in (0xF0, 0xF7):
-            length, index = _read_vlq(track_data, index)
-            index += length
+            if index >= length:
+                break
+            byte = track_data[index]
+            if byte < 0x80:
+                sysex_length = byte
+                index += 1
+            else:
+                sysex_length, index = _read_vlq(track_data, index)
+            index += sysex_length
             continue
 
-        event_type = status_byte & 0xF0
-        channel = status_byte & 0x0F
-        if event_type in (0x80, 0x90):
-            if index + 2 > len(track_data):
+        if status_byte < 0xA0:  # note-off / note-on
+            if index + 2 > length:
                 break
-            pitch = track_data[index]
-            velocity = track_data[index + 1]
+            pitch, velocity = unpack_bb(track_data, index)
             index += 2
-            events.append((tick, "note", (event_type, channel, pitch, velocity)))
-        elif event_type == 0xC0:
-            if index >= len(track_data):
+            append(
+                (tick, "note", (status_byte & 0xF0, status_byte & 0x0F, pitch, velocity))
+            )
+        elif status_byte & 0xF0 == 0xC0:
+            if index >= length:
                 break
             program = track_data[index]
             index += 1
-            events.append((tick, "program", (channel, program)))
+            append((tick, "program", (status_byte & 0x0F, program)))
         else:
-            param_length = 2 if event_type in (0xA0, 0xB0, 0xE0) else 1
-            index += param_length
+            index += _CHANNEL_EVENT_LEN[status_byte]
     return events
 
 
-def _read_vlq(data: bytes, index: int) -> Tuple[int, int]:
+def _read_vlq(data: Union[bytes, memoryview], index: int) -> Tuple[int, int]:
+    first = data[index]
+    if first < 0x80:
+        # Single-byte quantity: the overwhelmingly common delta-time case.
+        return first, index + 1
+    if index + 4 <= len(data):
+        # MIDI VLQs are at most 4 bytes, so grab one big-endian word and
+        # assemble the value branch-by-length instead of looping per byte.
+        word = int.from_bytes(data[index:index + 4], "big")
+        b1 = (word >> 16) & 0xFF
+        if b1 < 0x80:
+            return ((word >> 24) & 0x7F) << 7 | b1, index + 2
+        b2 = (word >> 8) & 0xFF
+        if b2 < 0x80:
+            return ((word >> 24) & 0x7F) << 14 | (b1 & 0x7F) << 7 | b2, index + 3
+        b3 = word & 0xFF
+        if b3 < 0x80:
+            return (
+                ((word >> 24) & 0x7F) << 21
+                | (b1 & 0x7F) << 14
+                | (b2 & 0x7F) << 7
+                | b3,
+                index + 4,
+            )
+        # Over-long quantity: fall through to the generic byte loop.
     value = 0
     while index < len(data):
         byte = data[index]
@@ -187,21 +332,9 @@ def _read_vlq(data: bytes, index: int) -> Tuple[int, int]:
     return value, index
 
 
-def _ticks_to_seconds(tick: int, tempo_us: int, ticks_per_quarter: int) -> float:
-    seconds_per_tick = tempo_us / 1_000_000.0 / ticks_per_quarter
-    return tick * seconds_per_tick
-
-
-def _seconds_to_ticks(seconds: float, tempo_bpm: float, ticks_per_quarter: int) -> int:
-    seconds_per_tick = 60.0 / tempo_bpm / ticks_per_quarter
-    return int(round(seconds / seconds_per_tick))
-
-
 def _encode_midi(midi: SimpleMidiFile) -> bytes:
     ticks = midi.ticks_per_quarter
-    header = b"MThd" + (6).to_bytes(4, "big") + (1).to_bytes(2, "big") + (
-        (len(midi.instruments) + 1)
-    ).to_bytes(2, "big") + ticks.to_bytes(2, "big")
+    header = _MTHD.pack(b"MThd", 6, 1, len(midi.instruments) + 1, ticks)
 
     tempo_us = int(round(60_000_000 / midi.tempo))
     tempo_track = bytearray()
@@ -211,50 +344,119 @@ def _encode_midi(midi: SimpleMidiFile) -> bytes:
     tempo_track.extend(b"\xFF\x51\x03" + tempo_us.to_bytes(3, "big"))
     tempo_track.extend(b"\x00\xFF\x2F\x00")
 
-    chunks = [header, b"MTrk" + len(tempo_track).to_bytes(4, "big") + tempo_track]
-
-    for instrument in midi.instruments:
-        track_bytes = _encode_instrument_track(
-            instrument, midi.tempo, midi.ticks_per_quarter
-        )
-        chunks.append(b"MTrk" + len(track_bytes).to_bytes(4, "big") + track_bytes)
-
-    return b"".join(chunks)
+    tracks = [bytes(tempo_track)]
+    tracks.extend(
+        _encode_instrument_track(instrument, midi.tempo, midi.ticks_per_quarter)
+        for instrument in midi.instruments
+    )
+
+    # Assemble the file in one contiguous buffer rather than concatenating
+    # per-track header + length + payload triples.
+    out = bytearray(len(header) + sum(8 + len(track) for track in tracks))
+    out[0:len(header)] = header
+    offset = len(header)
+    for track in tracks:
+        out[offset:offset + 4] = b"MTrk"
+        _U32.pack_into(out, offset + 4, len(track))
+        out[offset + 8:offset + 8 + len(track)] = track
+        offset += 8 + len(track)
+    return bytes(out)
 
 
 def _encode_instrument_track(instrument: MidiInstrument, tempo_bpm: float, ticks: int) -> bytes:
-    events: List[Tuple[int, bytes, int]] = []
     channel = instrument.channel & 0x0F
     program = instrument.program & 0x7F
 
-    events.append((0, bytes([0xC0 | channel, program]), 0))
-
-    for note in instrument.notes:
-        start_tick = max(0, _seconds_to_ticks(note.start, tempo_bpm, ticks))
-        end_tick = max(start_tick + 1, _seconds_to_ticks(note.end, tempo_bpm, ticks))
-        velocity = max(0, min(127, note.velocity))
-        events.append((start_tick, bytes([0x90 | channel, note.pitch & 0x7F, velocity]), 1))
-        events.append((end_tick, bytes([0x80 | channel, note.pitch & 0x7F, 0]), 2))
-
-    events.sort(key=lambda item: (item[0], item[2]))
-
-    data = bytearray()
+    # Convert all note times to ticks in one vectorized pass: the per-note
+    # divide folds into a single scale multiply per array.
+    note_count = len(instrument.notes)
+    starts = np.fromiter(
+        (note.start for note in instrument.notes), dtype=np.float64, count=note_count
+    )
+    ends = np.fromiter(
+        (note.end for note in instrument.notes), dtype=np.float64, count=note_count
+    )
+    pitches = np.fromiter(
+        (note.pitch & 0x7F for note in instrument.notes), dtype=np.int64, count=note_count
+    )
+    velocities = np.clip(
+        np.fromiter(
+            (note.velocity for note in instrument.notes), dtype=np.int64, count=note_count
+        ),
+        0,
+        127,
+    )
+    scale = tempo_bpm * ticks / 60.0
+    start_ticks = np.maximum(0, np.rint(starts * scale).astype(np.int64))
+    end_ticks = np.maximum(start_ticks + 1, np.rint(ends * scale).astype(np.int64))
+
+    # Keep note-ons and note-offs as two separately sorted tuple streams and
+    # merge them; tuple sorts need no lambda key, and heapq.merge is stable so
+    # ons still precede offs at the same tick.
+    on_events = sorted(zip(start_ticks.tolist(), pitches.tolist(), velocities.tolist()))
+    off_events = sorted(zip(end_ticks.tolist(), pitches.tolist()))
+
+    status_on = 0x90 | channel
+    status_off = 0x80 | channel
+
+    # Write into one preallocated buffer: at most a 4-byte delta plus a
+    # 3-byte message per event, with the program change and end-of-track
+    # marker on either side.
+    buf = bytearray(3 + (len(on_events) + len(off_events)) * 7 + 4)
+    buf[1] = 0xC0 | channel
+    buf[2] = program
+    offset = 3
+    pack_into = _NOTE_MSG.pack_into
     last_tick = 0
-    for tick, message, _ in events:
-        delta = tick - last_tick
-        data.extend(_encode_vlq(delta))
-        data.extend(message)
+    for event in heapq.merge(on_events, off_events, key=operator.itemgetter(0)):
+        tick = event[0]
+        offset = _write_vlq(buf, offset, tick - last_tick)
+        if len(event) == 3:
+            pack_into(buf, offset, status_on, event[1], event[2])
+        else:
+            pack_into(buf, offset, status_off, event[1], 0)
+        offset += 3
         last_tick = tick
-    data.extend(b"\x00\xFF\x2F\x00")
-    return bytes(data)
+    buf[offset:offset + 4] = b"\x00\xFF\x2F\x00"
+    return bytes(buf[:offset + 4])
+
+
+def _write_vlq(buf: bytearray, offset: int, value: int) -> int:
+    """Write ``value`` as a VLQ directly into ``buf``; returns the new offset."""
+
+    if value < 0x80:
+        buf[offset] = value
+        return offset + 1
+    if value < 0x4000:
+        buf[offset] = (value >> 7) | 0x80
+        buf[offset + 1] = value & 0x7F
+        return offset + 2
+    if value < 0x200000:
+        buf[offset] = (value >> 14) | 0x80
+        buf[offset + 1] = ((value >> 7) & 0x7F) | 0x80
+        buf[offset + 2] = value & 0x7F
+        return offset + 3
+    buf[offset] = ((value >> 21) & 0x7F) | 0x80
+    buf[offset + 1] = ((value >> 14) & 0x7F) | 0x80
+    buf[offset + 2] = ((value >> 7) & 0x7F) | 0x80
+    buf[offset + 3] = value & 0x7F
+    return offset + 4
 
 
 def _encode_vlq(value: int) -> bytes:
-    buffer = value & 0x7F
-    value >>= 7
-    bytes_out = bytearray()
-    while value:
-        bytes_out.insert(0, (value & 0x7F) | 0x80)
-        value >>= 7
-    bytes_out.append(buffer)
-    return bytes(bytes_out)
+    # MIDI quantities span at most four 7-bit groups, so branch directly on
+    # magnitude and build the result with a single bytes() call.
+    if value < 0x80:
+        return bytes((value,))
+    if value < 0x4000:
+        return bytes(((value >> 7) | 0x80, value & 0x7F))
+    if value < 0x200000:
+        return bytes(((value >> 14) | 0x80, ((value >> 7) & 0x7F) | 0x80, value & 0x7F))
+    return bytes(
+        (
+            ((value >> 21) & 0x7F) | 0x80,
+            ((value >> 14) & 0x7F) | 0x80,
+            ((value >> 7) & 0x7F) | 0x80,
+            value & 0x7F,
+        )
+    )